@@ -0,0 +1,194 @@
+# Copyright (c) 2025, KAINOTOMO PH LTD and Contributors
+# See license.txt
+
+import os
+import sys
+import tempfile
+import types
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from doc2sys.engine.text_extractor import TextExtractor, _has_module
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def make_extractor():
+	"""Build a TextExtractor without reading user settings from the database"""
+	extractor = TextExtractor.__new__(TextExtractor)
+	extractor.user = "Administrator"
+	extractor.user_settings = None
+	extractor.ocr_engine = "tesseract"
+	extractor.preprocess_mode = "grayscale"
+	extractor.llm_processor = None
+	extractor._languages_arg = ["eng"]
+	extractor._languages = None
+	return extractor
+
+
+class TestTextExtractor(FrappeTestCase):
+	def setUp(self):
+		self.extractor = make_extractor()
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def write_file(self, name, content):
+		path = os.path.join(self.tmpdir.name, name)
+		with open(path, "w", newline="") as f:
+			f.write(content)
+		return path
+
+	def write_docx(self, body):
+		path = os.path.join(self.tmpdir.name, "test.docx")
+		with zipfile.ZipFile(path, "w") as z:
+			z.writestr("word/document.xml", f"<w:document {W}><w:body>{body}</w:body></w:document>")
+		return path
+
+	# PDF pages without a text layer
+
+	def test_ocr_pages_without_text_only_ocrs_missing_pages(self):
+		page_texts = ["A page with a proper text layer", "", "Another page with plenty of text"]
+		with patch.object(TextExtractor, "_ocr_pdf_pages", return_value=["Scanned page text"]) as ocr:
+			result = self.extractor._ocr_pages_without_text("test.pdf", page_texts)
+
+		ocr.assert_called_once_with("test.pdf", [1])
+		self.assertEqual(result, [page_texts[0], "Scanned page text", page_texts[2]])
+
+	def test_ocr_pages_without_text_keeps_layer_for_placeholders(self):
+		page_texts = ["Page 1", "Enough text on this page to count"]
+		with patch.object(TextExtractor, "_ocr_pdf_pages", return_value=["No text detected in the image."]):
+			result = self.extractor._ocr_pages_without_text("test.pdf", page_texts)
+
+		self.assertEqual(result, page_texts)
+
+	def test_ocr_pages_without_text_keeps_longer_layer_text(self):
+		page_texts = ["Header text only", "Enough text on this page to count"]
+		with patch.object(TextExtractor, "_ocr_pdf_pages", return_value=["Hdr"]):
+			result = self.extractor._ocr_pages_without_text("test.pdf", page_texts)
+
+		self.assertEqual(result, page_texts)
+
+	def test_ocr_pages_without_text_skips_ocr_when_all_pages_have_text(self):
+		page_texts = ["Enough text on this page to count"] * 2
+		with patch.object(TextExtractor, "_ocr_pdf_pages") as ocr:
+			result = self.extractor._ocr_pages_without_text("test.pdf", page_texts)
+
+		ocr.assert_not_called()
+		self.assertEqual(result, page_texts)
+
+	def test_ocr_pages_without_text_keeps_layer_on_ocr_error(self):
+		page_texts = ["", "Enough text on this page to count"]
+		with patch.object(TextExtractor, "_ocr_pdf_pages", side_effect=RuntimeError("render failed")):
+			result = self.extractor._ocr_pages_without_text("test.pdf", page_texts)
+
+		self.assertEqual(result, page_texts)
+
+	# Batched Tesseract OCR
+
+	def ocr_images(self, tesseract_output, image_count):
+		pytesseract = types.ModuleType("pytesseract")
+		pytesseract.image_to_string = lambda *args, **kwargs: tesseract_output
+		image_paths = [f"page-{i}.png" for i in range(image_count)]
+		with patch.dict(sys.modules, {"pytesseract": pytesseract}), patch.object(
+			TextExtractor, "_check_tesseract_available", return_value=True
+		):
+			return self.extractor._extract_text_from_images_using_tesseract(image_paths)
+
+	def test_batched_tesseract_splits_pages_on_form_feed(self):
+		result = self.ocr_images("First page\n\fSecond page\n\f", 2)
+		self.assertEqual(result, ["First page", "Second page"])
+
+	def test_batched_tesseract_marks_blank_and_missing_pages(self):
+		result = self.ocr_images("First page\n\f \n\f", 3)
+		self.assertEqual(
+			result, ["First page", "No text detected in the image.", "No text detected in the image."]
+		)
+
+	def test_batched_tesseract_without_tesseract(self):
+		with patch.object(TextExtractor, "_check_tesseract_available", return_value=False):
+			result = self.extractor._extract_text_from_images_using_tesseract(["a.png", "b.png"])
+
+		self.assertEqual(len(result), 2)
+		self.assertTrue(all(text.startswith("OCR functionality not available") for text in result))
+
+	# DOCX
+
+	def test_docx_reads_paragraphs_and_tables_in_body_order(self):
+		path = self.write_docx(
+			"<w:p><w:r><w:t>Before</w:t><w:tab/><w:t>x</w:t></w:r></w:p>"
+			"<w:tbl><w:tr>"
+			"<w:tc><w:p><w:r><w:t>Cell 1</w:t></w:r></w:p></w:tc>"
+			"<w:tc><w:tbl><w:tr><w:tc><w:p><w:r><w:t>Nested</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+			"<w:p><w:r><w:t>Cell 2</w:t></w:r></w:p></w:tc>"
+			"</w:tr></w:tbl>"
+			"<w:p><w:hyperlink><w:r><w:t>link</w:t></w:r></w:hyperlink><w:r><w:br/><w:t>after</w:t></w:r></w:p>"
+		)
+		self.assertEqual(
+			self.extractor.extract_text_from_word(path), "Before\tx\nCell 1\nNested\nCell 2\nlink\nafter"
+		)
+
+	def test_docx_skips_text_boxes(self):
+		path = self.write_docx(
+			"<w:p><w:r><w:t>Body</w:t></w:r><w:r><w:drawing><w:txbxContent>"
+			"<w:p><w:r><w:t>Text box</w:t></w:r></w:p>"
+			"</w:txbxContent></w:drawing></w:r></w:p>"
+		)
+		self.assertEqual(self.extractor.extract_text_from_word(path), "Body")
+
+	@unittest.skipUnless(_has_module("docx"), "python-docx is not installed")
+	def test_docx_fallback_matches_streaming_reader(self):
+		import docx
+
+		document = docx.Document()
+		document.add_paragraph("Before")
+		table = document.add_table(rows=2, cols=2)
+		for row in range(2):
+			for column in range(2):
+				table.cell(row, column).text = f"r{row}c{column}"
+		table.cell(0, 0).merge(table.cell(0, 1))
+		document.add_paragraph("After")
+		path = os.path.join(self.tmpdir.name, "fallback.docx")
+		document.save(path)
+
+		document = docx.Document(path)
+		fallback = "\n".join(
+			self.extractor._iter_docx_block_text(document.element.body, document._body)
+		).strip()
+		self.assertEqual(fallback, self.extractor._extract_text_from_docx_xml(path))
+
+	# CSV
+
+	def assert_csv_text(self, content, expected):
+		path = self.write_file("test.csv", content)
+		self.assertEqual(self.extractor.extract_text_from_csv(path), expected)
+		with patch("doc2sys.engine.text_extractor._has_module", return_value=False):
+			self.assertEqual(self.extractor.extract_text_from_csv(path), expected)
+
+	def test_csv_joins_fields(self):
+		self.assert_csv_text('a,b,c\n1,"x, y",\n2,,3\n', "a, b, c\n1, x, y, \n2, , 3")
+
+	def test_csv_keeps_numbers_as_written(self):
+		self.assert_csv_text("id,amount\n007,1.50\n,NA\n", "id, amount\n007, 1.50\n, NA")
+
+	def test_csv_blank_lines(self):
+		self.assert_csv_text("a,b\n\n1,2\n", "a, b\n\n1, 2")
+		self.assert_csv_text("\na,b\n1,2\n", "a, b\n1, 2")
+
+	def test_csv_single_column_and_empty_file(self):
+		self.assert_csv_text("a\n\nb\n", "a\n\nb")
+		self.assert_csv_text("", "")
+
+	def test_csv_ragged_rows(self):
+		self.assert_csv_text("a,b\n1,2,3\n4\n", "a, b\n1, 2, 3\n4")
+
+	@unittest.skipUnless(_has_module("pyarrow.csv", "pyarrow.compute"), "pyarrow is not installed")
+	def test_csv_pyarrow_reader_matches_csv_module(self):
+		path = self.write_file("test.csv", 'name,total\n"Smith, J",10\nDoe,\nRoe,5\n')
+		self.assertEqual(
+			self.extractor._extract_text_from_csv_with_pyarrow(path), "name, total\nSmith, J, 10\nDoe, \nRoe, 5"
+		)
@@ -123,7 +123,7 @@ class EngineConfig:
                 # Store user reference
                 config['user'] = user
             else:
-                frappe.log_error(f"No Doc2Sys User Settings found for user {user}")
+                frappe.logger().warning(f"No Doc2Sys User Settings found for user {user}")
         except Exception as e:
             frappe.log_error(f"Error loading Doc2Sys user settings for {user}: {str(e)}")
             
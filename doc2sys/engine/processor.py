@@ -2,10 +2,13 @@
 Main processing logic for the document processing engine.
 """
 
+import codecs
 import os
 import subprocess
 import tempfile
+import threading
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import frappe
 from .config import EngineConfig
@@ -19,12 +22,35 @@ try:
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
 
+# In-process poppler bindings - falls back to the pdftotext CLI if unavailable
+try:
+    import pdftotext
+    PDFTOTEXT_AVAILABLE = True
+except ImportError:
+    PDFTOTEXT_AVAILABLE = False
+
+# Rasterization resolution for image-only PDFs. 200 DPI keeps business
+# documents readable for Tesseract at less than half the pixels of 300 DPI
+PDF_OCR_DPI = 200
+
+# OCR batches already run one tesseract process per core; stop each of them
+# from also starting its own OpenMP threads (inherited by the subprocesses)
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Cores available to the OCR of one document in the current thread. Set by
+# process_documents so that concurrent documents share the cores instead of
+# each starting a CPU-count sized pool of tesseract processes
+_OCR_WORKER_LIMIT = threading.local()
+
 class DocumentProcessor:
     """
     Core document processing class that handles document transformation
     and data extraction.
     """
     
+    # External tools don't disappear mid-process, so check them only once
+    _dependencies_checked = False
+    
     def __init__(self, config=None, user=None):
         """
         Initialize the document processor with optional configuration.
@@ -43,7 +69,9 @@ class DocumentProcessor:
         self.user = user or frappe.session.user
         
         # Check if required tools are installed
-        self._check_dependencies()
+        if not DocumentProcessor._dependencies_checked:
+            self._check_dependencies()
+            DocumentProcessor._dependencies_checked = True
     
     def _check_dependencies(self):
         """Check if required external tools are installed"""
@@ -70,7 +98,8 @@ class DocumentProcessor:
         
         Args:
             document_path: Path to the document file
-            options: Optional processing options
+            options: Optional processing options. "text_preview_length"
+                     truncates extracted_text to that many characters.
             
         Returns:
             Extracted data in structured format
@@ -93,6 +122,14 @@ class DocumentProcessor:
             # Extract text from document
             extracted_text = self.extract_text(document_path)
             
+            text_length = len(extracted_text)
+            
+            # Optionally keep only a preview so the full text of large
+            # documents is released as soon as this call returns
+            preview_length = options.get("text_preview_length")
+            if preview_length and text_length > preview_length:
+                extracted_text = extracted_text[:preview_length] + "..."
+            
             # Process the extracted text
             # (Future: Add more sophisticated processing here)
             
@@ -100,7 +137,7 @@ class DocumentProcessor:
                 "status": "success",
                 "file_path": document_path,
                 "file_type": get_file_extension(document_path),
-                "text_length": len(extracted_text),
+                "text_length": text_length,
                 "extracted_text": extracted_text,
                 "data": {}
             }
@@ -110,6 +147,42 @@ class DocumentProcessor:
             self.logger.error(f"Error processing document: {str(e)}")
             raise ProcessingError(f"Failed to process document: {str(e)}")
     
+    def process_documents(self, document_paths, options=None, max_workers=None):
+        """
+        Process several documents concurrently.
+        
+        Args:
+            document_paths: List of paths to document files
+            options: Optional processing options applied to every document
+            max_workers: Optional number of worker threads (defaults to CPU count)
+            
+        Returns:
+            List of results in the same order as document_paths. Documents that
+            fail are reported with status "error" instead of aborting the batch.
+        """
+        if not document_paths:
+            return []
+            
+        # Extraction time is spent in pdftotext/tesseract subprocesses, so a
+        # thread pool scales across cores. The worker threads don't get
+        # frappe.local, which process_document doesn't rely on
+        max_workers = max_workers or min(len(document_paths), os.cpu_count() or 1)
+        ocr_workers = max(1, (os.cpu_count() or 1) // max_workers)
+        
+        def process(document_path):
+            _OCR_WORKER_LIMIT.max_workers = ocr_workers
+            try:
+                return self.process_document(document_path, options)
+            except ProcessingError as e:
+                return {
+                    "status": "error",
+                    "file_path": document_path,
+                    "error": str(e)
+                }
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(process, document_paths))
+    
     def extract_text(self, file_path):
         """Extract text from a document based on its file type"""
         file_ext = get_file_extension(file_path)
@@ -137,24 +210,33 @@ class DocumentProcessor:
         """Extract text from PDF using poppler-utils"""
         self.logger.info(f"Extracting text from PDF: {pdf_path}")
         
-        # Create a temporary file for output
-        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as temp_file:
-            temp_txt_path = temp_file.name
+        if PDFTOTEXT_AVAILABLE:
+            try:
+                with open(pdf_path, 'rb') as f:
+                    pdf = pdftotext.PDF(f, physical=True)
+                text = "\n".join(pdf)
+                
+                if not text.strip() and self.config.ocr_enabled:
+                    self.logger.info(f"No text found in PDF, attempting OCR: {pdf_path}")
+                    return self._extract_text_from_pdf_with_ocr(pdf_path)
+                    
+                return text
+            except pdftotext.Error as e:
+                self.logger.warning(f"pdftotext binding failed, falling back to CLI: {str(e)}")
         
         try:
-            # Run pdftotext to extract text
-            cmd = ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, temp_txt_path]
+            # Run pdftotext and capture the text from stdout ("-" output file)
+            cmd = ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"]
             process = subprocess.run(
                 cmd, 
                 stdout=subprocess.PIPE, 
                 stderr=subprocess.PIPE,
                 text=True,
+                encoding='utf-8',
                 check=True
             )
             
-            # Read the extracted text
-            with open(temp_txt_path, 'r', encoding='utf-8') as f:
-                text = f.read()
+            text = process.stdout
             
             # If text is empty and OCR is enabled, try OCR instead
             # This now uses the user-specific OCR setting
@@ -166,10 +248,6 @@ class DocumentProcessor:
         except subprocess.CalledProcessError as e:
             self.logger.error(f"pdftotext error: {e.stderr}")
             raise ProcessingError(f"Failed to extract text from PDF: {e.stderr}")
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_txt_path):
-                os.unlink(temp_txt_path)
     
     def _extract_text_from_pdf_with_ocr(self, pdf_path):
         """Extract text from a PDF using OCR by converting to images first"""
@@ -184,23 +262,42 @@ class DocumentProcessor:
             
         self.logger.info(f"Converting PDF to images for OCR: {pdf_path}")
         
+        cores = getattr(_OCR_WORKER_LIMIT, 'max_workers', None) or os.cpu_count() or 1
+        
         try:
             with tempfile.TemporaryDirectory() as temp_dir:
-                # Convert PDF pages to images
-                images = convert_from_path(
+                # Convert PDF pages to images, keeping only the written paths
+                # (already in page order) instead of loading every page into memory
+                image_paths = convert_from_path(
                     pdf_path,
                     output_folder=temp_dir,
+                    output_file="page",
                     fmt='png',
-                    dpi=300  # Higher DPI for better OCR results
+                    dpi=PDF_OCR_DPI,
+                    grayscale=True,  # Tesseract binarizes anyway; a third of the RGB bytes
+                    thread_count=cores,
+                    paths_only=True
                 )
                 
-                all_text = []
+                if not image_paths:
+                    return ""
+                
+                # Split the pages into one contiguous batch per core. Each batch
+                # is a single tesseract run, so the language models are loaded
+                # once per batch rather than once per page, and the subprocesses
+                # keep every core busy from a plain thread pool
+                self.logger.info(f"Processing {len(image_paths)} PDF pages with OCR")
+                max_workers = min(len(image_paths), cores)
+                batch_size = -(-len(image_paths) // max_workers)
+                batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    page_texts = [
+                        page_text
+                        for batch_texts in executor.map(self._extract_text_with_ocr_batch, batches)
+                        for page_text in batch_texts
+                    ]
                 
-                # Process each page image with OCR
-                for i, img_path in enumerate(sorted([os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if f.endswith('.png')])):
-                    self.logger.info(f"Processing PDF page {i+1} with OCR")
-                    page_text = self._extract_text_with_ocr(img_path)
-                    all_text.append(f"--- Page {i+1} ---\n{page_text}")
+                all_text = [f"--- Page {i+1} ---\n{page_text}" for i, page_text in enumerate(page_texts)]
                 
                 # Combine text from all pages
                 return "\n\n".join(all_text)
@@ -218,20 +315,13 @@ class DocumentProcessor:
         
         self.logger.info(f"Extracting text with OCR: {image_path}")
         
-        # Create a temporary file for output
-        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as temp_file:
-            temp_txt_path = temp_file.name
-        
         try:
-            # Run tesseract for OCR with configured languages from user settings
-            output_base = os.path.splitext(temp_txt_path)[0]
-            
             # Join language codes with '+' for tesseract
             # These are user-specific languages from their settings
             lang_param = '+'.join(self.config.ocr_languages)
             
-            # Build command with language parameter
-            cmd = ["tesseract", image_path, output_base, "-l", lang_param]
+            # Build command with language parameter, writing the text to stdout
+            cmd = ["tesseract", image_path, "stdout", "-l", lang_param]
             
             self.logger.info(f"Running OCR for user {self.user} with languages: {lang_param}")
             
@@ -240,35 +330,79 @@ class DocumentProcessor:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
+                encoding='utf-8',
                 check=True
             )
             
-            # Tesseract automatically adds .txt extension
-            actual_output = output_base + ".txt"
-            
-            # Read the extracted text
-            with open(actual_output, 'r', encoding='utf-8') as f:
-                text = f.read()
+            return process.stdout
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Tesseract OCR error: {e.stderr}")
+            raise ProcessingError(f"Failed to extract text with OCR: {e.stderr}")
                 
-            return text
+    def _extract_text_with_ocr_batch(self, image_paths):
+        """Extract text from several images with a single Tesseract run, one entry per image"""
+        if len(image_paths) == 1:
+            return [self._extract_text_with_ocr(image_paths[0])]
+            
+        if not self.config.ocr_enabled:
+            self.logger.warning(f"OCR is disabled for user {self.user} in settings")
+            return [""] * len(image_paths)
+        
+        # Tesseract treats a .txt input as a list of images, one path per line
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+            list_file.write("\n".join(image_paths) + "\n")
+            list_path = list_file.name
+        
+        try:
+            lang_param = '+'.join(self.config.ocr_languages)
+            cmd = ["tesseract", list_path, "stdout", "-l", lang_param, "-c", "page_separator=\f"]
+            
+            self.logger.info(f"Running OCR on {len(image_paths)} pages for user {self.user} with languages: {lang_param}")
+            
+            process = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                check=True
+            )
+            
+            # Each page is terminated by the separator
+            page_texts = process.stdout.split("\f")[:len(image_paths)]
+            page_texts += [""] * (len(image_paths) - len(page_texts))
+            return page_texts
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Tesseract OCR error: {e.stderr}")
             raise ProcessingError(f"Failed to extract text with OCR: {e.stderr}")
         finally:
-            # Clean up temporary files
-            if os.path.exists(temp_txt_path + '.txt'):
-                os.unlink(temp_txt_path + '.txt')
-                
+            if os.path.exists(list_path):
+                os.unlink(list_path)
+    
     def _extract_text_from_text_file(self, file_path):
         """Extract text from plain text files"""
         self.logger.info(f"Reading text file: {file_path}")
+        # Read the raw bytes once and pick the encoding from them, so a
+        # non-UTF-8 file is never read from disk twice. Unbuffered reads go
+        # straight to FileIO.readall, which sizes its buffer from the file size
+        with open(file_path, 'rb', buffering=0) as f:
+            data = f.read()
+        
+        # Translate line endings as text-mode open() would
+        return self._decode_text(data).replace('\r\n', '\n').replace('\r', '\n')
+    
+    def _decode_text(self, data):
+        """Decode raw text bytes, guessing the encoding from their BOM and content"""
+        if data.startswith(codecs.BOM_UTF8):
+            return data.decode('utf-8-sig')
+        if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return data.decode('utf-16')
+        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return data.decode('utf-8')
         except UnicodeDecodeError:
-            # Try different encoding if UTF-8 fails
-            with open(file_path, 'r', encoding='latin-1') as f:
-                return f.read()
+            # latin-1 maps every byte, so it can always decode the content
+            return data.decode('latin-1')
                 
     def _extract_text_from_docx(self, file_path):
         """Extract text from DOCX files"""
@@ -1,49 +1,153 @@
-from io import StringIO
+from io import BytesIO, StringIO
 import os
+import mmap
+import tempfile
+import threading
+import zipfile
+from xml.etree import ElementTree
 import frappe
 import csv
 import warnings
 import base64
+import functools
+import importlib
 from .llm_processor import LLMProcessor  # Import the LLMProcessor
+from .utils import log_error, thread_map
 
 # Suppress PyPDF2 deprecation warning
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="PyPDF2")
 
-# Import PyPDF2 with error handling
-try:
-    from PyPDF2 import PdfReader
-except ImportError:
-    PdfReader = None
+# Make all dependency imports conditional. The optional libraries (PyPDF2,
+# pypdfium2, pytesseract, tesserocr, python-docx, OpenCV/numpy, pyarrow) are
+# imported on first use through _has_module, so importing this module - which
+# the Doc2Sys Item controller does - doesn't load them into every worker
 
-# Make all dependency imports conditional
-HAS_DOCX = False
-HAS_PDF = PdfReader is not None
-HAS_TESSERACT = False
-HAS_CV2 = False
+# Pages are OCR'd in parallel, one worker per core, so keep each Tesseract
+# run single-threaded; its OpenMP threads only contend with the other workers.
+# Must be set before libtesseract is loaded (tesserocr) or the binary is
+# spawned (pytesseract), and an explicit setting is left alone
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
-# Try importing docx
-try:
-    import docx
-    HAS_DOCX = True
-except ImportError:
-    pass
+from PIL import Image
 
-# Try importing OpenCV
-try:
-    import cv2
-    import numpy as np
-    HAS_CV2 = True
-except ImportError:
-    pass
+# File extension -> TextExtractor method used by extract_text
+EXTRACTION_HANDLERS = {
+    **{ext: 'extract_text_from_image' for ext in ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')},
+    '.pdf': 'extract_text_from_pdf',
+    '.docx': 'extract_text_from_word',
+    '.doc': 'extract_text_from_word',
+    '.csv': 'extract_text_from_csv',
+    '.txt': 'extract_text_from_text_file',
+    '.md': 'extract_text_from_text_file',
+    '.json': 'extract_text_from_text_file',
+}
 
-# Try importing pytesseract
-try:
-    import pytesseract
-    HAS_TESSERACT = True
-except ImportError:
-    pass
+# Rasterization resolution for OCR of image-only PDFs
+PDF_OCR_DPI = 200
 
-from PIL import Image
+# WordprocessingML elements read when streaming DOCX text
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+WORD_PARAGRAPH_TAG = WORD_NAMESPACE + 'p'
+WORD_TEXT_TAG = WORD_NAMESPACE + 't'
+WORD_TAB_TAG = WORD_NAMESPACE + 'tab'
+WORD_BREAK_TAGS = (WORD_NAMESPACE + 'br', WORD_NAMESPACE + 'cr')
+WORD_BODY_TAG = WORD_NAMESPACE + 'body'
+WORD_TABLE_TAG = WORD_NAMESPACE + 'tbl'
+# Table, row and cell elements holding the paragraphs of (nested) tables
+WORD_TABLE_TAGS = (WORD_TABLE_TAG, WORD_NAMESPACE + 'tr', WORD_NAMESPACE + 'tc')
+
+# Run content python-docx's Paragraph.text leaves out: drawings, VML shapes
+# and their text boxes. Word writes each text box twice (mc:Choice and
+# mc:Fallback), so reading into these would duplicate their text
+WORD_SKIPPED_TAGS = (
+    '{http://schemas.openxmlformats.org/markup-compatibility/2006}AlternateContent',
+    WORD_NAMESPACE + 'drawing',
+    WORD_NAMESPACE + 'pict',
+    WORD_NAMESPACE + 'txbxContent',
+)
+
+# Longest side (in pixels) of images sent to the LLM for OCR
+LLM_IMAGE_MAX_SIDE = 2048
+
+# PDF pages with fewer non-whitespace characters than this are OCR'd
+PDF_PAGE_MIN_TEXT_CHARS = 20
+
+# Image preprocessing before Tesseract OCR, chosen with the OCR Preprocessing
+# user setting: "none" passes the file as-is, "grayscale" only converts it and
+# "adaptive" also binarizes low-contrast scans. Tesseract's LSTM engine does
+# well on plain grayscale, so that is the default
+PREPROCESS_MODES = ("none", "grayscale", "adaptive")
+DEFAULT_PREPROCESS_MODE = "grayscale"
+
+# Messages the OCR helpers return instead of page text
+OCR_PLACEHOLDER_PREFIXES = (
+    "No text detected in the image.",
+    "OCR functionality not available.",
+    "Error extracting text",
+    "Failed to extract text",
+)
+
+# Images smaller than this (in bytes) are OCR'd without preprocessing
+PREPROCESS_MIN_FILE_SIZE = 50 * 1024
+
+# Text files larger than this (in bytes) are read through mmap
+MMAP_MIN_FILE_SIZE = 1024 * 1024
+
+# Doc2Sys User Settings name per (site, user), shared by all TextExtractor instances
+_USER_SETTINGS_NAMES = {}
+
+# Persistent tesserocr APIs per thread, keyed by language string
+_TESSEROCR_APIS = threading.local()
+
+# Result of the Tesseract binary check, shared by all TextExtractor instances
+_TESSERACT_AVAILABLE = None
+
+# (function, exception type) pairs already written to the Error Log by this process
+_LOGGED_ERROR_SIGNATURES = set()
+_LOGGED_ERROR_SIGNATURES_LOCK = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _has_module(*module_names):
+    """
+    Check that optional modules can be imported, importing them on first use
+    
+    Unlike a find_spec lookup, this also catches packages that are installed
+    but fail to load, e.g. OpenCV on a server without libGL.
+    """
+    try:
+        for module_name in module_names:
+            importlib.import_module(module_name)
+        return True
+    except ImportError:
+        return False
+
+@functools.lru_cache(maxsize=None)
+def _has_opencl():
+    """Check whether OpenCV can offload image preprocessing to an OpenCL device"""
+    import cv2
+    return cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+def _log_error(message, e=None):
+    """
+    Log an extraction error without flooding the Error Log
+    
+    Every occurrence goes to the doc2sys log file, but only the first error per
+    (function, exception type) in this process is inserted into the Error Log,
+    so a batch of broken files does not turn into thousands of INSERTs.
+    """
+    frappe.logger("doc2sys").error(message, exc_info=e is not None)
+    
+    if e is not None and e.__traceback__ is not None:
+        signature = (e.__traceback__.tb_frame.f_code.co_name, type(e).__name__)
+    else:
+        signature = (message, None)
+        
+    with _LOGGED_ERROR_SIGNATURES_LOCK:
+        if signature in _LOGGED_ERROR_SIGNATURES:
+            return
+        _LOGGED_ERROR_SIGNATURES.add(signature)
+        
+    log_error(message, "Doc2Sys")
 
 class TextExtractor:
     def __init__(self, languages=None, user=None):
@@ -65,38 +169,61 @@ class TextExtractor:
         if self.user_settings and self.user_settings.ocr_enabled:
             self.ocr_engine = self.user_settings.ocr_engine or "tesseract"
             
+        # Determine image preprocessing mode
+        self.preprocess_mode = DEFAULT_PREPROCESS_MODE
+        ocr_preprocess = (self.user_settings.get("ocr_preprocess") or "").lower() if self.user_settings else ""
+        if ocr_preprocess in PREPROCESS_MODES:
+            self.preprocess_mode = ocr_preprocess
+            
         # Initialize LLM processor if needed
         self.llm_processor = None
         if self.ocr_engine == "llm_api":
             try:
                 self.llm_processor = LLMProcessor(user=self.user)
             except Exception as e:
-                frappe.log_error(f"Failed to initialize LLM processor for OCR: {str(e)}", "Doc2Sys")
+                _log_error(f"Failed to initialize LLM processor for OCR: {str(e)}", e)
                 self.ocr_engine = "tesseract"  # Fallback to tesseract on error
                 
-        # Get languages from settings if not provided
-        if languages is None:
-            self.languages = self._get_languages_from_settings()
-        else:
-            self.languages = languages if isinstance(languages, list) else ['eng']
-            
-        # Ensure we have at least English as fallback
-        if not self.languages:
-            self.languages = ['eng']
+        # OCR languages are resolved on first use, so extractions that never
+        # reach OCR (text, CSV, Word, PDFs with a text layer) skip the lookup
+        self._languages_arg = languages
+        self._languages = None
+        
+    @property
+    def languages(self):
+        """OCR language codes, resolved lazily from the arguments or settings"""
+        if self._languages is None:
+            # Get languages from settings if not provided
+            if self._languages_arg is None:
+                languages = self._get_languages_from_settings()
+            else:
+                languages = self._languages_arg if isinstance(self._languages_arg, list) else ['eng']
+                
+            # Ensure we have at least English as fallback
+            self._languages = languages or ['eng']
             
+        return self._languages
+        
     def _get_user_settings(self):
         """Get user-specific settings document"""
+        key = (frappe.local.site, self.user)
         try:
-            user_settings_list = frappe.get_all(
-                'Doc2Sys User Settings',
-                filters={'user': self.user},
-                fields=['name']
-            )
-            
-            if user_settings_list:
-                return frappe.get_doc('Doc2Sys User Settings', user_settings_list[0].name)
+            # The settings name for a user never changes, so remember it and
+            # read the document through Frappe's document cache, which is
+            # invalidated whenever the settings are saved
+            name = _USER_SETTINGS_NAMES.get(key)
+            if not name:
+                name = frappe.db.get_value('Doc2Sys User Settings', {'user': self.user}, 'name')
+                if not name:
+                    return None
+                _USER_SETTINGS_NAMES[key] = name
+                
+            return frappe.get_cached_doc('Doc2Sys User Settings', name)
+        except frappe.DoesNotExistError:
+            # Settings were deleted since the name was cached
+            _USER_SETTINGS_NAMES.pop(key, None)
         except Exception as e:
-            frappe.log_error(f"Error fetching user settings for {self.user}: {str(e)}", "Doc2Sys")
+            _log_error(f"Error fetching user settings for {self.user}: {str(e)}", e)
             
         return None
             
@@ -117,9 +244,9 @@ class TextExtractor:
                 if enabled_langs:
                     languages = enabled_langs
                     
-            frappe.log_error(f"Using OCR languages for user {self.user}: {', '.join(languages)}", "Doc2Sys")
+            frappe.logger().debug(f"Using OCR languages for user {self.user}: {', '.join(languages)}")
         except Exception as e:
-            frappe.log_error(f"Error fetching OCR language settings for user {self.user}: {str(e)}", "Doc2Sys")
+            _log_error(f"Error fetching OCR language settings for user {self.user}: {str(e)}", e)
             
         return languages
     
@@ -130,71 +257,127 @@ class TextExtractor:
             
         file_extension = os.path.splitext(file_path)[1].lower()
         
+        handler = EXTRACTION_HANDLERS.get(file_extension)
+        if not handler:
+            return f"Text extraction not supported for {file_extension} files"
+            
         try:
-            if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']:
-                return self.extract_text_from_image(file_path)
-            elif file_extension == '.pdf':
-                return self.extract_text_from_pdf(file_path)
-            elif file_extension in ['.docx', '.doc']:
-                return self.extract_text_from_word(file_path)
-            elif file_extension == '.csv':
-                return self.extract_text_from_csv(file_path)
-            elif file_extension in ['.txt', '.md', '.json']:
-                return self.extract_text_from_text_file(file_path)
-            else:
-                return f"Text extraction not supported for {file_extension} files"
+            return getattr(self, handler)(file_path)
         except Exception as e:
-            frappe.log_error(f"Error extracting text from {file_path}: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from {file_path}: {str(e)}", e)
             return f"Error extracting text: {str(e)}"
     
     def _check_tesseract_available(self):
-        """Check if Tesseract OCR is available"""
-        global HAS_TESSERACT
+        """Check if Tesseract OCR is available (checked once per process)"""
+        global _TESSERACT_AVAILABLE
         
-        if HAS_TESSERACT:
+        if _TESSERACT_AVAILABLE is not None:
+            return _TESSERACT_AVAILABLE
+            
+        if _has_module("tesserocr"):
+            # tesserocr links libtesseract directly, no binary needed
+            _TESSERACT_AVAILABLE = True
             return True
             
+        if not _has_module("pytesseract"):
+            _log_error("Pytesseract not installed - cannot perform OCR")
+            _TESSERACT_AVAILABLE = False
+            return False
+            
         try:
             import pytesseract
+            # Spawns the tesseract binary, so only do it on the first check
             pytesseract.get_tesseract_version()
-            HAS_TESSERACT = True
-            return True
-        except ImportError:
-            frappe.log_error("Pytesseract not installed - cannot perform OCR", "Doc2Sys")
-            return False
+            _TESSERACT_AVAILABLE = True
         except Exception as e:
-            frappe.log_error(f"Tesseract OCR not available: {str(e)}", "Doc2Sys")
-            return False
+            _log_error(f"Tesseract OCR not available: {str(e)}", e)
+            _TESSERACT_AVAILABLE = False
+            
+        return _TESSERACT_AVAILABLE
     
     def preprocess_image(self, image_path):
-        """Preprocess image for better OCR results if OpenCV is available"""
-        if not HAS_CV2:
-            return image_path
+        """
+        Preprocess image for better OCR results if OpenCV is available
+        
+        Returns an in-memory image (numpy array or PIL Image) that can be
+        passed straight to pytesseract, so nothing is written back to disk.
+        Thresholding only runs in "adaptive" mode, and even then small or
+        already high-contrast images are returned without it.
+        """
+        if self.preprocess_mode == "none" or not _has_module("cv2", "numpy"):
+            return Image.open(image_path)
         
         try:
-            # Read the image
-            image = cv2.imread(image_path)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                          cv2.THRESH_BINARY, 11, 2)
-            
-            # Save processed image to a temporary file
-            temp_path = f"{image_path}_processed.png"
-            cv2.imwrite(temp_path, thresh)
+            import cv2
+            import numpy as np
             
-            return temp_path
+            # Small images OCR quickly as they are, so skip the extra passes
+            if os.path.getsize(image_path) < PREPROCESS_MIN_FILE_SIZE:
+                return Image.open(image_path)
+                
+            # Read the image, decoding straight to grayscale. Decoding from
+            # the raw bytes also copes with non-ASCII upload paths
+            gray = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                # OpenCV can't decode this file (e.g. GIF); let PIL/Tesseract try as-is
+                return Image.open(image_path)
+            
+            if self.preprocess_mode == "adaptive":
+                return self._threshold_image(gray)
+                
+            return gray
         except Exception as e:
-            frappe.log_error(f"Error preprocessing image: {str(e)}", "Doc2Sys")
-            return image_path
+            _log_error(f"Error preprocessing image: {str(e)}", e)
+            return Image.open(image_path)
+    
+    def _preprocess_image_file(self, image_path):
+        """Preprocess an image file in place"""
+        processed = self.preprocess_image(image_path)
+        if isinstance(processed, Image.Image):
+            # Returned unchanged; nothing to write back
+            processed.close()
+            return
+            
+        import cv2
+        ok, encoded = cv2.imencode('.png', processed)
+        if ok:
+            encoded.tofile(image_path)
+    
+    def _threshold_image(self, gray):
+        """Binarize a grayscale numpy image for OCR"""
+        import cv2
+        
+        # Clean, born-digital images are already close to binary and
+        # thresholding them can only lose detail
+        if self._is_high_contrast(gray):
+            return gray
+        
+        # Apply adaptive thresholding. The mean variant uses a separable
+        # box filter, which is cheaper than the Gaussian-weighted one
+        if _has_opencl():
+            # Run the filter as an OpenCL kernel on the GPU and copy the result back
+            thresh = cv2.adaptiveThreshold(cv2.UMat(gray), 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
+                                           cv2.THRESH_BINARY, 11, 2)
+            return thresh.get()
+            
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
+                                     cv2.THRESH_BINARY, 11, 2)
+    
+    def _is_high_contrast(self, gray):
+        """Check whether a grayscale image is already mostly black and white"""
+        import numpy as np
+        
+        if float(gray.std()) > 70:
+            return True
+            
+        # Share of mid-tone pixels; scanned pages have plenty, exports almost none
+        mid_tones = np.count_nonzero((gray > 40) & (gray < 215)) / gray.size
+        return mid_tones < 0.05
     
     def _extract_text_using_llm(self, image_path):
         """Extract text from image using LLM API"""
         if not self.llm_processor:
-            frappe.log_error("LLM processor not available for OCR", "Doc2Sys")
+            _log_error("LLM processor not available for OCR")
             return "OCR functionality not available. Cannot extract text from image."
             
         try:
@@ -239,7 +422,7 @@ class TextExtractor:
             return content.strip()
                 
         except Exception as e:
-            frappe.log_error(f"Error extracting text using LLM: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text using LLM: {str(e)}", e)
             return f"Error extracting text using LLM: {str(e)}"
     
     def _get_image_data_url(self, image_path):
@@ -255,13 +438,50 @@ class TextExtractor:
                 '.tiff': 'image/tiff'
             }.get(file_extension, 'image/jpeg')
             
-            with open(image_path, 'rb') as img_file:
-                base64_image = base64.b64encode(img_file.read()).decode('utf-8')
-                return f"data:{content_type};base64,{base64_image}"
+            # LLM endpoints downsize large inputs server-side anyway, so
+            # shrink them first instead of uploading pixels that are dropped
+            with Image.open(image_path) as img:
+                if max(img.size) > LLM_IMAGE_MAX_SIDE:
+                    content_type, raw = self._encode_downscaled_image(img)
+                else:
+                    raw = None
+                    
+            if raw is None:
+                with open(image_path, 'rb', buffering=0) as img_file:
+                    raw = img_file.read()
+                
+            # Assemble the URL as bytes and decode once, instead of decoding
+            # the base64 payload and then copying it again into an f-string
+            data_url = b"".join((b"data:", content_type.encode('ascii'), b";base64,", base64.b64encode(raw)))
+            del raw
+            return data_url.decode('ascii')
         except Exception as e:
-            frappe.log_error(f"Error converting image to data URL: {str(e)}", "Doc2Sys")
+            _log_error(f"Error converting image to data URL: {str(e)}", e)
             return None
     
+    def _encode_downscaled_image(self, img):
+        """Downscale a PIL image to LLM_IMAGE_MAX_SIDE and return (content type, encoded bytes)"""
+        img.thumbnail((LLM_IMAGE_MAX_SIDE, LLM_IMAGE_MAX_SIDE), Image.LANCZOS)
+        
+        buffer = BytesIO()
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            # Transparent images are usually screenshots or graphics. Flatten
+            # them onto white, as a viewer would, instead of letting the
+            # transparent background turn black, and keep them as PNG
+            rgba = img.convert('RGBA')
+            flattened = Image.alpha_composite(Image.new('RGBA', rgba.size, 'white'), rgba).convert('RGB')
+            flattened.save(buffer, format='PNG')
+            return 'image/png', buffer.getvalue()
+            
+        if img.mode in ('1', 'L', 'P'):
+            # Scans and other text-like images keep sharp edges as PNG
+            img.save(buffer, format='PNG')
+            return 'image/png', buffer.getvalue()
+            
+        # Photos compress far better as JPEG
+        img.convert('RGB').save(buffer, format='JPEG', quality=85)
+        return 'image/jpeg', buffer.getvalue()
+    
     def extract_text_from_image(self, image_path):
         """Extract text from image using configured OCR method"""
         # Use LLM-based OCR if configured
@@ -275,67 +495,187 @@ class TextExtractor:
         
         try:
             # Preprocess the image for better OCR results if OpenCV is available
-            processed_path = self.preprocess_image(image_path)
-            
-            # Join languages with + for Tesseract format (e.g., eng+ell)
-            lang_param = '+'.join(self.languages)
+            processed_image = self.preprocess_image(image_path)
             
-            # Configure OCR options
-            config = f'--psm 3'  # Page segmentation mode 3: Fully automatic
+            return self._extract_text_using_tesseract(processed_image)
+                
+        except Exception as e:
+            _log_error(f"Error extracting text from image: {str(e)}", e)
+            return f"Error extracting text from image: {str(e)}"
+    
+    def _extract_text_from_images_using_tesseract(self, image_paths):
+        """OCR several image files with a single tesseract run, one entry per image"""
+        if not self._check_tesseract_available():
+            return ["OCR functionality not available. Cannot extract text from image."] * len(image_paths)
             
-            # Extract text using Tesseract
-            text = pytesseract.image_to_string(Image.open(processed_path), lang=lang_param, config=config)
+        # Tesseract treats a .txt input as a list of images, one path per line
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+            list_file.write("\n".join(image_paths) + "\n")
+            list_path = list_file.name
             
-            # Clean up the temporary file if it was created
-            if processed_path != image_path and os.path.exists(processed_path):
-                try:
-                    os.remove(processed_path)
-                except:
-                    pass
+        try:
+            lang_param = '+'.join(self.languages)
+            config = '--psm 3 -c page_separator=\f'
             
-            # If no text detected
-            if not text.strip():
-                return "No text detected in the image."
-                
-            return text.strip()
-                
+            import pytesseract
+            # A path string is handed to tesseract as-is
+            text = pytesseract.image_to_string(list_path, lang=lang_param, config=config)
+            
+            # Each page is terminated by the separator
+            page_texts = [page_text.strip() or "No text detected in the image." for page_text in text.split("\f")]
+            page_texts = page_texts[:len(image_paths)]
+            page_texts += ["No text detected in the image."] * (len(image_paths) - len(page_texts))
+            return page_texts
         except Exception as e:
-            frappe.log_error(f"Error extracting text from image: {str(e)}", "Doc2Sys")
-            return f"Error extracting text from image: {str(e)}"
+            _log_error(f"Error extracting text from images: {str(e)}", e)
+            return [f"Error extracting text from image: {str(e)}"] * len(image_paths)
+        finally:
+            try:
+                os.remove(list_path)
+            except OSError:
+                pass
+    
+    def _get_tesserocr_api(self, lang_param):
+        """
+        Get this thread's Tesseract API for a language set
+        
+        Language data is loaded once per thread and language set instead of
+        once per image. An API instance must not be shared between threads,
+        so concurrent page OCR gets one per worker thread.
+        """
+        apis = getattr(_TESSEROCR_APIS, 'apis', None)
+        if apis is None:
+            apis = _TESSEROCR_APIS.apis = {}
+            
+        api = apis.get(lang_param)
+        if api is None:
+            from tesserocr import PyTessBaseAPI, PSM
+            api = apis[lang_param] = PyTessBaseAPI(lang=lang_param, psm=PSM.AUTO)
+        return api
+    
+    def _extract_text_using_tesseract(self, image):
+        """Run Tesseract on an in-memory image (PIL Image or numpy array)"""
+        # Join languages with + for Tesseract format (e.g., eng+ell)
+        lang_param = '+'.join(self.languages)
+        
+        # Configure OCR options
+        config = f'--psm 3'  # Page segmentation mode 3: Fully automatic
+        
+        # Extract text using Tesseract
+        if _has_module("tesserocr"):
+            api = self._get_tesserocr_api(lang_param)
+            api.SetImage(image if isinstance(image, Image.Image) else Image.fromarray(image))
+            text = api.GetUTF8Text()
+        else:
+            import pytesseract
+            text = pytesseract.image_to_string(image, lang=lang_param, config=config)
+        
+        # If no text detected
+        if not text.strip():
+            return "No text detected in the image."
+            
+        return text.strip()
     
     def extract_text_from_pdf(self, pdf_path):
         """Extract text from PDF file"""
-        if not HAS_PDF:
-            return "PDF extraction not available. Please install PyPDF2."
+        if not _has_module("pypdfium2") and not _has_module("PyPDF2"):
+            return "PDF extraction not available. Please install pypdfium2 or PyPDF2."
             
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-            
-            if not text.strip():
-                # If no text extracted, use the configured OCR method
-                if self.ocr_engine == "llm_api" and self.llm_processor:
-                    # Try direct LLM processing of the PDF if possible
-                    result = self._try_direct_llm_pdf_processing(pdf_path)
-                    if result:
-                        return result
+            # Read every page's text layer, even when the first one is empty
+            # (e.g. a scanned cover), so later pages with text keep it
+            if _has_module("pypdfium2"):
+                page_texts = self._extract_pdf_pages_with_pdfium(pdf_path)
+            else:
+                page_texts = self._extract_pdf_pages_with_pypdf2(pdf_path)
                 
-                # Otherwise try the PDF to image conversion approach
-                if self._check_tesseract_available() or (self.ocr_engine == "llm_api" and self.llm_processor):
-                    return self._extract_text_from_pdf_using_ocr(pdf_path)
-                else:
-                    return f"No readable text found in PDF. Consider converting to images for OCR."
+            has_text_layer = [self._has_text_layer(page_text) for page_text in page_texts]
+            text = "\n\n".join(page_text for page_text in page_texts if page_text).strip()
+            if all(has_text_layer):
+                return text
+                
+            # Only probe for OCR once some page actually needs it
+            can_ocr = self._check_tesseract_available() or (self.ocr_engine == "llm_api" and self.llm_processor)
+            
+            if any(has_text_layer):
+                # Mixed documents: OCR only the pages without a usable text layer
+                if can_ocr:
+                    page_texts = self._ocr_pages_without_text(pdf_path, page_texts)
+                    text = "\n\n".join(page_text for page_text in page_texts if page_text).strip()
+                return text
                 
-            return text.strip()
+            # No page has a usable text layer: a scan, possibly carrying only a
+            # thin layer such as a scanner watermark or page footer
+            if self.ocr_engine == "llm_api" and self.llm_processor:
+                # Try direct LLM processing of the PDF if possible
+                result = self._try_direct_llm_pdf_processing(pdf_path)
+                if result:
+                    return result
+                    
+            # Otherwise try the PDF to image conversion approach
+            if can_ocr:
+                ocr_text = self._extract_text_from_pdf_using_ocr(pdf_path)
+                # Keep the thin text layer if OCR failed or found nothing
+                if ocr_text and not (text and ocr_text.startswith(OCR_PLACEHOLDER_PREFIXES)):
+                    return ocr_text
+                    
+            return text or "No readable text found in PDF. Consider converting to images for OCR."
             
         except Exception as e:
-            frappe.log_error(f"Error extracting text from PDF: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from PDF: {str(e)}", e)
             return f"Error extracting text from PDF: {str(e)}"
     
+    def _has_text_layer(self, page_text):
+        """Check whether extracted page text is substantial enough to skip OCR"""
+        return bool(page_text) and len("".join(page_text.split())) >= PDF_PAGE_MIN_TEXT_CHARS
+    
+    def _ocr_pages_without_text(self, pdf_path, page_texts):
+        """Replace the text of pages that have no text layer with their OCR text"""
+        page_numbers = [i for i, page_text in enumerate(page_texts) if not self._has_text_layer(page_text)]
+        if not page_numbers:
+            return page_texts
+            
+        try:
+            ocr_texts = self._ocr_pdf_pages(pdf_path, page_numbers)
+        except Exception as e:
+            # Keep whatever the text layer gave us
+            _log_error(f"Error extracting text from PDF pages using OCR: {str(e)}", e)
+            return page_texts
+            
+        page_texts = list(page_texts)
+        for page_number, ocr_text in zip(page_numbers, ocr_texts):
+            # Blank or separator pages OCR to nothing or a placeholder
+            # message; keep the text layer unless OCR found more
+            if ocr_text.startswith(OCR_PLACEHOLDER_PREFIXES):
+                continue
+            if len("".join(ocr_text.split())) > len("".join((page_texts[page_number] or "").split())):
+                page_texts[page_number] = ocr_text
+        return page_texts
+    
+    def _extract_pdf_pages_with_pdfium(self, pdf_path):
+        """Extract the text of every PDF page using PDFium"""
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page_texts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                # PDFium ends lines with \r\n; keep PyPDF2's \n
+                page_texts.append(textpage.get_text_bounded().replace('\r\n', '\n').replace('\r', '\n'))
+                textpage.close()
+                page.close()
+            return page_texts
+        finally:
+            pdf.close()
+    
+    def _extract_pdf_pages_with_pypdf2(self, pdf_path):
+        """Extract the text of every PDF page using PyPDF2"""
+        # Non-strict parsing tolerates minor spec violations instead of
+        # validating them; pages are only parsed when accessed
+        from PyPDF2 import PdfReader
+        reader = PdfReader(pdf_path, strict=False)
+        return [page.extract_text() for page in reader.pages]
+    
     def _try_direct_llm_pdf_processing(self, pdf_path):
         """Attempt to process PDF directly with LLM if supported"""
         if self.ocr_engine != "llm_api" or not self.llm_processor:
@@ -372,77 +712,277 @@ class TextExtractor:
             return content.strip() if content.strip() else None
             
         except Exception as e:
-            frappe.log_error(f"Error processing PDF directly with LLM: {str(e)}", "Doc2Sys")
+            _log_error(f"Error processing PDF directly with LLM: {str(e)}", e)
             return None
     
     def _extract_text_from_pdf_using_ocr(self, pdf_path):
         """Extract text from PDF using OCR by converting to images first"""
         try:
-            # Try importing pdf2image for PDF to image conversion
-            import pdf2image
-            pages = pdf2image.convert_from_path(pdf_path)
-            
-            text = ""
-            for i, page in enumerate(pages):
-                # Save page as temporary image
-                temp_img = f"/tmp/pdf_page_{i}.png"
-                page.save(temp_img, "PNG")
-                
-                # Extract text from the image using the configured OCR method
-                page_text = self.extract_text_from_image(temp_img)
-                text += page_text + "\n\n"
-                
-                # Remove temporary image
-                try:
-                    os.remove(temp_img)
-                except:
-                    pass
-            
-            return text.strip()
+            page_texts = self._ocr_pdf_pages(pdf_path)
+            return "\n\n".join(page_texts).strip()
         except ImportError:
             return "PDF to image conversion not available. Please install pdf2image."
         except Exception as e:
-            frappe.log_error(f"Error extracting text from PDF using OCR: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from PDF using OCR: {str(e)}", e)
             return f"Error extracting text from PDF using OCR: {str(e)}"
     
+    def _ocr_pdf_pages(self, pdf_path, page_numbers=None):
+        """
+        OCR the given pages of a PDF (0-based), or all pages if None
+        
+        Returns one text per rendered page, in page order.
+        """
+        with tempfile.TemporaryDirectory(prefix="doc2sys_pdf_") as temp_dir:
+            image_paths = self._render_pdf_pages(pdf_path, temp_dir, page_numbers)
+            if not image_paths:
+                return []
+                
+            # Pages are independent and the OCR work happens outside the GIL
+            # (tesseract subprocess or LLM HTTP call), so OCR them concurrently
+            if self.ocr_engine != "llm_api" and _has_module("pytesseract") and not _has_module("tesserocr"):
+                # The batched run reads the page files itself, so apply the
+                # preprocessing the single-image path would do to them first
+                if self.preprocess_mode == "adaptive":
+                    thread_map(self._preprocess_image_file, image_paths)
+                    
+                # One tesseract run per contiguous batch of pages, one batch
+                # per core, so language data is loaded once per batch
+                max_workers = min(len(image_paths), os.cpu_count() or 1) or 1
+                batch_size = -(-len(image_paths) // max_workers)
+                batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+                return [
+                    page_text
+                    for batch_texts in thread_map(self._extract_text_from_images_using_tesseract, batches)
+                    for page_text in batch_texts
+                ]
+                
+            return thread_map(self.extract_text_from_image, image_paths)
+    
+    def _render_pdf_pages(self, pdf_path, output_folder, page_numbers=None):
+        """Render PDF pages (0-based, all if None) to PNG files and return their paths in order"""
+        if _has_module("pypdfium2"):
+            return self._render_pdf_pages_with_pdfium(pdf_path, output_folder, page_numbers)
+            
+        # Try importing pdf2image for PDF to image conversion
+        import pdf2image
+        
+        # Render pages to files with several poppler threads and keep only
+        # their paths, so at most one decoded page per OCR worker is held in
+        # memory instead of the whole document
+        options = {
+            'dpi': PDF_OCR_DPI,
+            'output_folder': output_folder,
+            'fmt': 'png',
+            'grayscale': True,  # as the PDFium renderer does
+            'paths_only': True,
+            'thread_count': min(os.cpu_count() or 1, 8),
+        }
+        
+        if page_numbers is None:
+            return pdf2image.convert_from_path(pdf_path, **options)
+            
+        image_paths = []
+        for page_number in page_numbers:
+            image_paths += pdf2image.convert_from_path(
+                pdf_path,
+                first_page=page_number + 1,
+                last_page=page_number + 1,
+                output_file=f"page{page_number:05d}",
+                **options
+            )
+        return image_paths
+    
+    def _render_pdf_pages_with_pdfium(self, pdf_path, output_folder, page_numbers=None):
+        """Render PDF pages to grayscale PNG files in-process using PDFium"""
+        # PDFium is not thread-safe, so pages are rendered one after another;
+        # this still avoids starting a pdftoppm process for the document
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            if page_numbers is None:
+                page_numbers = range(len(pdf))
+                
+            image_paths = []
+            for page_number in page_numbers:
+                page = pdf[page_number]
+                bitmap = page.render(scale=PDF_OCR_DPI / 72, grayscale=True)
+                image_path = os.path.join(output_folder, f"page{page_number:05d}.png")
+                # The file is only read back once by OCR, so favour speed
+                # over size when compressing it
+                bitmap.to_pil().save(image_path, compress_level=1)
+                bitmap.close()
+                page.close()
+                image_paths.append(image_path)
+            return image_paths
+        finally:
+            pdf.close()
+    
     def extract_text_from_word(self, docx_path):
         """Extract text from Word document"""
-        if not HAS_DOCX:
+        try:
+            return self._extract_text_from_docx_xml(docx_path)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+            # Not a plain DOCX package; let python-docx have a go
+            pass
+            
+        if not _has_module("docx"):
             return "Word document extraction not available. Please install python-docx."
             
         try:
+            import docx
             doc = docx.Document(docx_path)
-            text = ""
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-            
-            return text.strip()
+            return "\n".join(self._iter_docx_block_text(doc.element.body, doc._body)).strip()
             
         except Exception as e:
-            frappe.log_error(f"Error extracting text from Word doc: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from Word doc: {str(e)}", e)
             return f"Error extracting text from Word doc: {str(e)}"
     
+    def _extract_text_from_docx_xml(self, docx_path):
+        """
+        Extract paragraph and table text by streaming word/document.xml out of the DOCX zip
+        
+        Avoids building python-docx's full document model; each top-level
+        element is cleared as soon as it has been read. Body paragraphs and
+        table cell paragraphs are read in document order, matching the
+        python-docx fallback; text boxes are left out of both paths.
+        """
+        paragraphs = []
+        open_tags = []
+        with zipfile.ZipFile(docx_path) as z, z.open('word/document.xml') as xml:
+            for event, elem in ElementTree.iterparse(xml, events=('start', 'end')):
+                if event == 'start':
+                    open_tags.append(elem.tag)
+                    continue
+                    
+                open_tags.pop()
+                if not open_tags or open_tags[-1] != WORD_BODY_TAG:
+                    continue
+                    
+                if elem.tag == WORD_PARAGRAPH_TAG:
+                    paragraphs.append("".join(self._iter_docx_run_text(elem)))
+                elif elem.tag == WORD_TABLE_TAG:
+                    paragraphs.extend(self._iter_docx_table_text(elem))
+                elem.clear()
+                
+        return "\n".join(paragraphs).strip()
+    
+    def _iter_docx_table_text(self, elem):
+        """Yield the text of each paragraph in a DOCX table, row by row and cell by cell"""
+        for child in elem:
+            if child.tag == WORD_PARAGRAPH_TAG:
+                yield "".join(self._iter_docx_run_text(child))
+            elif child.tag in WORD_TABLE_TAGS:
+                # Nested tables are read in place, inside their cell
+                yield from self._iter_docx_table_text(child)
+    
+    def _iter_docx_block_text(self, element, parent):
+        """Yield paragraph and table cell text of a python-docx body or cell element in document order"""
+        from docx.oxml.ns import qn
+        from docx.table import Table, _Cell
+        from docx.text.paragraph import Paragraph
+        
+        for child in element.iterchildren(qn('w:p'), qn('w:tbl')):
+            if child.tag == qn('w:p'):
+                yield Paragraph(child, parent).text
+                continue
+                
+            table = Table(child, parent)
+            # Each w:tc once, as in the XML; row.cells repeats merged cells
+            for tr in child.tr_lst:
+                for tc in tr.tc_lst:
+                    yield from self._iter_docx_block_text(tc, _Cell(tc, table))
+    
+    def _iter_docx_run_text(self, elem):
+        """Yield the text of a DOCX paragraph element, skipping drawings and text boxes"""
+        for child in elem:
+            if child.tag == WORD_TEXT_TAG:
+                yield child.text or ""
+            elif child.tag == WORD_TAB_TAG:
+                yield "\t"
+            elif child.tag in WORD_BREAK_TAGS:
+                yield "\n"
+            elif child.tag not in WORD_SKIPPED_TAGS:
+                yield from self._iter_docx_run_text(child)
+    
     def extract_text_from_csv(self, csv_path):
         """Extract text from CSV file"""
+        # pyarrow: multithreaded C++ CSV reader
+        if _has_module("pyarrow.csv", "pyarrow.compute"):
+            import pyarrow as pa
+            try:
+                text = self._extract_text_from_csv_with_pyarrow(csv_path)
+                if text is not None:
+                    return text
+            except (pa.ArrowInvalid, UnicodeDecodeError):
+                # Ragged or non-UTF-8 files go through the csv module
+                pass
+                
         try:
-            text = ""
             with open(csv_path, 'r', encoding='utf-8', errors='ignore') as f:
                 reader = csv.reader(f)
-                for row in reader:
-                    text += ", ".join(row) + "\n"
-            
-            return text.strip()
+                return "\n".join(", ".join(row) for row in reader).strip()
             
         except Exception as e:
-            frappe.log_error(f"Error extracting text from CSV: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from CSV: {str(e)}", e)
             return f"Error extracting text from CSV: {str(e)}"
     
+    def _extract_text_from_csv_with_pyarrow(self, csv_path):
+        """
+        Extract text from CSV file using Arrow's multithreaded C++ reader
+        
+        Returns None for files whose output could differ from the csv module's
+        (empty files, blank lines in multi-column files), so the caller can
+        fall back to it.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+        from pyarrow import csv as pa_csv
+        
+        # Keep every field as the original text. Column types are keyed by
+        # the generated names (f0, f1, ...), so count the columns first
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            first_row = next(csv.reader(f), None)
+        if not first_row:
+            # Empty file, or one starting with a blank line
+            return None
+            
+        column_types = {f"f{i}": pa.string() for i in range(len(first_row))}
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            # Keep blank lines as rows, like csv.reader does
+            parse_options=pa_csv.ParseOptions(ignore_empty_lines=False),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=False)
+        )
+        
+        rows = pa_compute.binary_join_element_wise(
+            *table.columns, ", ", null_handling='replace', null_replacement=""
+        )
+        
+        # Arrow fills a blank line with empty fields, where csv.reader yields
+        # an empty row; let the csv module handle such files
+        if len(first_row) > 1 and pa_compute.any(pa_compute.equal(rows, ", " * (len(first_row) - 1))).as_py():
+            return None
+            
+        return "\n".join(rows.to_pylist()).strip()
+    
     def extract_text_from_text_file(self, text_file_path):
         """Extract text from plain text file"""
         try:
-            with open(text_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read().strip()
+            if os.path.getsize(text_file_path) > MMAP_MIN_FILE_SIZE:
+                # Decode straight from the mapped pages, skipping the
+                # intermediate bytes copy of a regular read
+                with open(text_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    text = str(mm, 'utf-8', 'ignore')
+            else:
+                # Read the raw bytes and decode them in one call rather than
+                # through a TextIOWrapper
+                with open(text_file_path, 'rb', buffering=0) as f:
+                    text = f.read().decode('utf-8', 'ignore')
+                    
+            # Translate line endings as text-mode open() would
+            return text.replace('\r\n', '\n').replace('\r', '\n').strip()
                 
         except Exception as e:
-            frappe.log_error(f"Error extracting text from text file: {str(e)}", "Doc2Sys")
+            _log_error(f"Error extracting text from text file: {str(e)}", e)
             return f"Error extracting text from text file: {str(e)}"
\ No newline at end of file
@@ -6,6 +6,8 @@ import os
 import logging
 import frappe
 import importlib.util
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(
@@ -14,9 +16,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger('doc2sys.engine')
 
+# File extensions supported when the caller doesn't pass its own list
+DEFAULT_SUPPORTED_TYPES = frozenset(['pdf', 'docx', 'txt', 'jpg', 'png'])
+
 def get_file_extension(file_path):
     """Get the extension of a file"""
-    import os
     _, extension = os.path.splitext(file_path)
     return extension.lower()[1:] if extension else ""
 
@@ -32,7 +36,67 @@ def is_supported_file_type(file_path, supported_types=None):
         bool: True if supported, False otherwise
     """
     if supported_types is None:
-        supported_types = ['pdf', 'docx', 'txt', 'jpg', 'png']
+        supported_types = DEFAULT_SUPPORTED_TYPES
         
     ext = get_file_extension(file_path)
     return ext in supported_types
+
+# Error Log entries raised inside thread_map workers, written afterwards by
+# the calling thread
+_WORKER_ERRORS = contextvars.ContextVar("doc2sys_worker_errors", default=None)
+
+def log_error(message, title):
+    """
+    Write an Error Log entry, deferring it when called from a thread_map worker
+    
+    The site's database connection belongs to the thread that opened it and
+    must not be used from several threads at once, so inside a worker the
+    entry is queued and written once thread_map has collected the results.
+    """
+    errors = _WORKER_ERRORS.get()
+    if errors is None:
+        frappe.log_error(message, title)
+    else:
+        errors.append((message, title))
+
+def _run_in_worker(errors, func, item):
+    """Run func in a thread_map worker, queueing its Error Log entries"""
+    _WORKER_ERRORS.set(errors)
+    return func(item)
+
+def thread_map(func, items, max_workers=None):
+    """
+    Apply func to every item using a thread pool, preserving order.
+    
+    Each call runs in a copy of the caller's context so that frappe.local
+    (site, configuration, logging) can be read inside the workers. The
+    workers must not use the database: Error Log entries made through
+    log_error are written by the calling thread once all items are done.
+    
+    Args:
+        func: Callable taking a single item
+        items: Iterable of items
+        max_workers: Optional number of threads (defaults to CPU count)
+        
+    Returns:
+        list: Results in the same order as items
+    """
+    items = list(items)
+    if not items:
+        return []
+        
+    max_workers = max_workers or min(len(items), os.cpu_count() or 1)
+    if max_workers == 1:
+        return [func(item) for item in items]
+        
+    errors = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, _run_in_worker, errors, func, item)
+                for item in items
+            ]
+            return [future.result() for future in futures]
+    finally:
+        for message, title in errors:
+            log_error(message, title)
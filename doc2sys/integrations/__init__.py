@@ -1,5 +1,11 @@
 """
 Doc2Sys Integrations package that provides connectivity to external systems.
 """
-# Import registry first to ensure it's initialized before connectors
-from doc2sys.integrations.registry import register_integration, get_integration_class
\ No newline at end of file
+
+def __getattr__(name):
+    # Resolve the registry helpers on first use, so importing a submodule
+    # of this package doesn't pull in the registry and its dependencies
+    if name in ("register_integration", "get_integration_class"):
+        from doc2sys.integrations import registry
+        return getattr(registry, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")